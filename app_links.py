@@ -7,27 +7,41 @@
 #    - Permite elegir la hoja, la columna TIENDA y la columna LINK/URL.
 #    - Limpia y deduplica pares (tienda, link).
 #    - Muestra 3 vistas (filas, columnas, texto con saltos).
-#    - Descarga un Excel con todas las vistas.
+#    - Descarga todas las vistas en Excel (o CSV/Parquet en un ZIP).
 #
 # 2) === NUEVO === Comparar tiendas entre dos archivos (CSV o Excel):
 #    - Cargas Archivo A y Archivo B (acepta .csv o .xlsx).
 #    - Eliges la columna que corresponde a TIENDA en cada archivo.
 #    - Muestra Coincidencias, Solo en A (faltan en B), Solo en B (faltan en A).
 #    - (Opcional) Agrega hojas con links por tienda y una comparativa lado a lado.
-#    - Descarga un Excel con todas las tablas.
+#    - Descarga todas las tablas en Excel (o CSV/Parquet en un ZIP).
 #    === /NUEVO ===
 #
 # Requisitos:
-#   pip install streamlit pandas openpyxl
+#   pip install -r requirements.txt
+#   (streamlit, pandas>=2.2, openpyxl, xlsxwriter, pyarrow, python-calamine)
+#   pyarrow y python-calamine solo aceleran la lectura: si faltan, la app usa
+#   los motores por defecto de pandas.
 # Ejecución:
 #   streamlit run app_links.py
 # ------------------------------------------------------------
 
 import io
+import re
+import hashlib
+import zipfile
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+PANDAS_VERSION = tuple(int(x) for x in re.findall(r"\d+", pd.__version__)[:2])
+
+# Copy-on-Write: los filtros/renombres de columnas no copian los datos hasta que
+# se modifican (en pandas >= 3.0 ya está siempre activo y la opción está obsoleta)
+if PANDAS_VERSION < (3, 0):
+    pd.options.mode.copy_on_write = True
+
 # ------------------------------------------------------------
 # Configuración básica de la página
 # ------------------------------------------------------------
@@ -36,24 +50,66 @@ st.set_page_config(page_title="Links & Comparación de tiendas", page_icon="🧰
 # ------------------------------------------------------------
 # Utilidades comunes (funciones pequeñas y reutilizables)
 # ------------------------------------------------------------
-def leer_tabla(uploaded_file):
+URL_RE = re.compile(r"https?://", re.IGNORECASE)
+
+# Lectores rápidos opcionales: pyarrow para CSV y python-calamine (Rust) para XLSX.
+# Si no están instalados se usan los motores por defecto de pandas. El motor
+# "calamine" de read_excel existe desde pandas 2.2.
+try:
+    import pyarrow  # noqa: F401
+    HAY_PYARROW = True
+except ImportError:
+    HAY_PYARROW = False
+# Solo el motor: con dtype_backend="pyarrow" una columna numérica con vacíos sale
+# como int64[pyarrow] ("101") y no coincide con la misma columna leída del XLSX ("101.0")
+CSV_KWARGS = {"engine": "pyarrow"} if HAY_PYARROW else {}
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine" if PANDAS_VERSION >= (2, 2) else None
+except ImportError:
+    EXCEL_ENGINE = None
+
+# Las lecturas se cachean por contenido; el caché es compartido por todas las
+# sesiones, así que se limita a pocas entradas y una hora de vida
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def _hojas_excel(data: bytes) -> list:
+    """Nombres de hoja de un XLSX (cacheado por contenido del archivo)."""
+    return pd.ExcelFile(io.BytesIO(data), engine=EXCEL_ENGINE).sheet_names
+
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def _leer_excel(data: bytes, hoja: str) -> pd.DataFrame:
+    """Lee una hoja de un XLSX (cacheado por contenido + hoja)."""
+    return pd.read_excel(io.BytesIO(data), sheet_name=hoja, engine=EXCEL_ENGINE)
+
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def _leer_csv(data: bytes) -> pd.DataFrame:
+    """Lee un CSV (cacheado por contenido del archivo)."""
+    return pd.read_csv(io.BytesIO(data), **CSV_KWARGS)
+
+def elegir_hoja(uploaded_file):
     """
-    Lee un CSV o un XLSX subido y devuelve (df, nombre_hoja).
-    - Si es CSV: no hay hoja -> retorna (df, None).
-    - Si es XLSX: pregunta por la hoja y la usa.
+    Si el archivo subido es XLSX, pregunta por la hoja y la devuelve; si es CSV, devuelve None.
+    Va separado de la lectura para que leer_tabla no dependa de widgets.
     """
-    name = uploaded_file.name.lower()
-    if name.endswith(".csv"):
-        df = pd.read_csv(uploaded_file)
-        return df, None
-    elif name.endswith(".xlsx"):
-        xls = pd.ExcelFile(uploaded_file)
-        hoja = st.selectbox(f"Hoja en {uploaded_file.name}:", xls.sheet_names, index=0, key=f"hoja_{uploaded_file.name}")
-        df = pd.read_excel(uploaded_file, sheet_name=hoja)
-        return df, hoja
-    else:
-        st.error("Formato no soportado. Usa .csv o .xlsx")
-        return pd.DataFrame(), None
+    if uploaded_file.name.lower().endswith(".xlsx"):
+        hojas = _hojas_excel(uploaded_file.getvalue())
+        return st.selectbox(f"Hoja en {uploaded_file.name}:", hojas, index=0, key=f"hoja_{uploaded_file.name}")
+    return None
+
+def leer_tabla(nombre: str, data: bytes, hoja=None) -> pd.DataFrame:
+    """
+    Lee un CSV o un XLSX (bytes del archivo subido) y devuelve el DataFrame.
+    - Si es CSV: se ignora la hoja.
+    - Si es XLSX: lee la hoja indicada.
+    No usa widgets. La lectura se cachea por contenido, así los reruns de
+    Streamlit no vuelven a parsear el archivo.
+    """
+    nombre = nombre.lower()
+    if nombre.endswith(".csv"):
+        return _leer_csv(data)
+    elif nombre.endswith(".xlsx"):
+        return _leer_excel(data, hoja)
+    raise ValueError("Formato no soportado. Usa .csv o .xlsx")
 
 def limpiar_df(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -63,11 +119,12 @@ def limpiar_df(df: pd.DataFrame) -> pd.DataFrame:
     - en 'tienda': quita espacios extremos y colapsa espacios múltiples.
     """
     if df.empty:
-        return df.copy()
-    # Eliminar columnas automáticas 'Unnamed'
-    df = df.loc[:, ~df.columns.str.contains(r"^Unnamed", case=False, regex=True)].copy()
+        return df
+    # Eliminar columnas automáticas 'Unnamed' (con Copy-on-Write no se copian los datos)
+    keep = [not str(c).lower().startswith("unnamed") for c in df.columns]
+    df = df.loc[:, keep]
     # Nombres de columnas sin espacios extremos
-    df.columns = [str(c).strip() for c in df.columns]
+    df = df.rename(columns=lambda c: str(c).strip())
     # Normaliza 'tienda'
     if "tienda" in df.columns:
         df["tienda"] = (
@@ -80,7 +137,23 @@ def limpiar_df(df: pd.DataFrame) -> pd.DataFrame:
 
 def detectar_cols_link(df: pd.DataFrame):
     """Devuelve las columnas cuyo nombre empieza con 'link' (insensible a mayúsculas)."""
-    return [c for c in df.columns if str(c).lower().startswith("link")]
+    nombres = df.columns.astype("string").str.lower()
+    return df.columns[nombres.str.startswith("link", na=False)].tolist()
+
+def detectar_cols_url(df: pd.DataFrame, muestra: int = 200) -> list:
+    """
+    Devuelve las columnas de texto que contienen URLs (http/https), en orden.
+    Solo revisa los primeros `muestra` valores no nulos de cada columna: basta
+    para poblar un selector sin recorrer millones de filas.
+    """
+    cols = []
+    for c, s in df.items():
+        if not pd.api.types.is_string_dtype(s.dtype):
+            continue
+        vals = s.dropna().head(muestra).astype("string")
+        if vals.str.contains(URL_RE, na=False).any():
+            cols.append(c)
+    return cols
 
 def elegir_columna_tienda(df: pd.DataFrame, key="tienda"):
     """
@@ -91,21 +164,6 @@ def elegir_columna_tienda(df: pd.DataFrame, key="tienda"):
     default = cols.index("tienda") if "tienda" in cols else 0
     return st.selectbox("Columna TIENDA:", cols, index=int(default), key=key)
 
-def links_por_fila(row, link_cols):
-    """A partir de varias columnas de links, junta los valores no vacíos, sin duplicados y respetando el orden."""
-    vals = []
-    for c in link_cols:
-        v = row.get(c, None)
-        if pd.notna(v) and str(v).strip():
-            vals.append(str(v).strip())
-    # Únicos manteniendo orden
-    seen, ordered = set(), []
-    for v in vals:
-        if v not in seen:
-            ordered.append(v)
-            seen.add(v)
-    return ordered
-
 def agregar_links_por_tienda(df: pd.DataFrame) -> pd.DataFrame:
     """
     Devuelve una tabla [tienda, links], donde 'links' es la lista combinada
@@ -118,28 +176,140 @@ def agregar_links_por_tienda(df: pd.DataFrame) -> pd.DataFrame:
         base = df[["tienda"]].drop_duplicates().copy()
         base["links"] = [[] for _ in range(len(base))]
         return base
-    tmp = df.copy()
-    tmp["links"] = tmp.apply(lambda r: links_por_fila(r, link_cols), axis=1)
-    agg = (
-        tmp.groupby("tienda", dropna=False)["links"]
-        .apply(lambda lists: list(dict.fromkeys([v for sub in lists for v in sub])))
-        .reset_index()
+    # Formato largo (tienda, valor); el orden estable por fila original respeta
+    # el orden de aparición: fila por fila y, dentro de cada fila, link_1..link_n
+    largo = (
+        df[["tienda", *link_cols]]
+        .reset_index(drop=True)
+        .melt(id_vars="tienda", value_vars=link_cols, value_name="valor", ignore_index=False)
+        .sort_index(kind="stable")
     )
+    largo["valor"] = largo["valor"].astype("string").str.strip()
+    largo = largo[largo["valor"].notna() & (largo["valor"] != "")]
+    largo = largo.drop_duplicates(subset=["tienda", "valor"], keep="first")
+    links = largo.groupby("tienda", dropna=False)["valor"].agg(list)
+    # Tiendas sin ningún link conservan su fila con lista vacía
+    agg = df[["tienda"]].drop_duplicates().sort_values("tienda").reset_index(drop=True)
+    agg["links"] = [v if isinstance(v, list) else [] for v in agg["tienda"].map(links)]
     return agg
 
+def deduplicar_pares(df: pd.DataFrame, col_tienda: str, col_link: str) -> pd.DataFrame:
+    """
+    Limpia y deduplica los pares (tienda, link) de las columnas elegidas.
+    Devuelve [tienda, link] sin vacíos ni duplicados, ordenado por tienda y link.
+    """
+    base = (
+        df[[col_tienda, col_link]]
+        .dropna()
+        .astype(str)
+        .assign(**{
+            col_tienda: lambda x: x[col_tienda].str.strip(),
+            col_link:   lambda x: x[col_link].str.strip(),
+        })
+    )
+    base = base[base[col_link] != ""]
+    base.columns = ["tienda", "link"]
+
+    # Deduplicar y ordenar sobre códigos enteros en vez de strings: las categorías
+    # salen ordenadas, así que la clave (código_tienda << 32 | código_link) ordena
+    # igual que (tienda, link) y np.unique deduplica y ordena en una sola pasada
+    ct = pd.Categorical(base["tienda"])
+    cl = pd.Categorical(base["link"])
+    if len(ct.categories) >= 2**31 or len(cl.categories) >= 2**32:
+        return (
+            base.drop_duplicates(subset=["tienda", "link"])
+                .sort_values(["tienda", "link"])
+                .reset_index(drop=True)
+        )
+    key = (ct.codes.astype(np.int64) << 32) | (cl.codes.astype(np.int64) & 0xFFFFFFFF)
+    _, first_idx = np.unique(key, return_index=True)
+    pares_unicos = base.iloc[first_idx].reset_index(drop=True)
+    return pares_unicos
+
+def calcular_vistas(df: pd.DataFrame, col_tienda: str, col_link: str):
+    """
+    Devuelve (pares_unicos, wide, links_por_tienda) para las columnas elegidas:
+    - pares_unicos: una fila por (tienda, link).
+    - wide: una fila por tienda con link_1..link_n.
+    - links_por_tienda: conteo y links separados por salto de línea.
+    """
+    pares_unicos = deduplicar_pares(df, col_tienda, col_link)
+    # 'tienda' como categoría: groupby/pivot trabajan sobre códigos enteros y no
+    # sobre strings (las categorías quedan ordenadas, igual que el sort por tienda)
+    pares_unicos["tienda"] = pares_unicos["tienda"].astype("category")
+
+    wide = (
+        pares_unicos.assign(rank=pares_unicos.groupby("tienda", observed=True).cumcount() + 1)
+        .pivot(index="tienda", columns="rank", values="link")
+        .fillna("")
+        .add_prefix("link_")
+        .rename_axis(columns=None)
+        .reset_index()
+    )
+
+    # pares_unicos ya no tiene duplicados: size() == nunique() y no hace falta unique()
+    g = pares_unicos.groupby("tienda", sort=True, observed=True)["link"]
+    links_por_tienda = pd.DataFrame({
+        "links_unicos": g.size(),
+        "links_unicos_list": g.agg("\n".join),
+    }).reset_index()
+    return pares_unicos, wide, links_por_tienda
+
 def descargar_excel(dfs: dict, nombre: str = "resultado.xlsx") -> bytes:
     """
     Recibe un dict {'NombreHoja': DataFrame, ...} y devuelve los bytes de un Excel con todas las hojas.
     Útil para descargar múltiples vistas/tablas en un solo archivo.
     """
     buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+    # xlsxwriter escribe más rápido que openpyxl; strings_to_urls=False evita
+    # escanear cada celda de texto buscando URLs (aquí casi todo son links)
+    with pd.ExcelWriter(buffer, engine="xlsxwriter", engine_kwargs={"options": {"strings_to_urls": False}}) as writer:
         for hoja, data in dfs.items():
             # Excel limita el nombre de hoja a 31 caracteres
             data.to_excel(writer, sheet_name=str(hoja)[:31], index=False)
     buffer.seek(0)
     return buffer.read()
 
+def descargar_zip(dfs: dict, formato: str = "csv") -> bytes:
+    """
+    Recibe un dict {'NombreTabla': DataFrame, ...} y devuelve los bytes de un ZIP
+    con un archivo por tabla, en CSV o Parquet. Mucho más barato que armar un Excel.
+    """
+    buffer = io.BytesIO()
+    # Parquet ya viene comprimido (zstd): se guarda tal cual dentro del ZIP
+    compresion = zipfile.ZIP_STORED if formato == "parquet" else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(buffer, "w", compression=compresion) as zf:
+        for nombre, data in dfs.items():
+            if formato == "parquet":
+                zf.writestr(f"{nombre}.parquet", data.to_parquet(engine="pyarrow", compression="zstd", index=False))
+            else:
+                # utf-8-sig para que Excel abra bien los acentos
+                zf.writestr(f"{nombre}.csv", data.to_csv(index=False).encode("utf-8-sig"))
+    return buffer.getvalue()
+
+# Formato de descarga -> (extensión, mime). Parquet solo si pyarrow está instalado.
+FORMATOS_DESCARGA = {
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV (.zip)": ("zip", "application/zip"),
+}
+if HAY_PYARROW:
+    FORMATOS_DESCARGA["Parquet (.zip)"] = ("zip", "application/zip")
+
+def boton_descarga(dfs: dict, nombre_base: str, etiqueta: str, key: str):
+    """
+    Muestra el selector de formato (Excel por defecto, CSV o Parquet en ZIP)
+    y el botón para descargar todas las tablas de `dfs`.
+    """
+    formato = st.radio("Formato de descarga:", list(FORMATOS_DESCARGA), index=0, horizontal=True, key=key)
+    ext, mime = FORMATOS_DESCARGA[formato]
+    if formato.startswith("Excel"):
+        binario = descargar_excel(dfs, f"{nombre_base}.{ext}")
+    elif formato.startswith("Parquet"):
+        binario = descargar_zip(dfs, "parquet")
+    else:
+        binario = descargar_zip(dfs, "csv")
+    st.download_button(etiqueta, data=binario, file_name=f"{nombre_base}.{ext}", mime=mime)
+
 # ------------------------------------------------------------
 # Sidebar / Menú de navegación
 # ------------------------------------------------------------
@@ -169,9 +339,9 @@ if modo.startswith("🧹"):
         st.info("Sube un archivo para empezar.")
     else:
         # (1) Seleccionar hoja
-        xls = pd.ExcelFile(up)
-        hoja = st.selectbox("Hoja:", xls.sheet_names, index=0, key="depurar_hoja")
-        df = pd.read_excel(up, sheet_name=hoja)
+        data = up.getvalue()
+        hoja = st.selectbox("Hoja:", _hojas_excel(data), index=0, key="depurar_hoja")
+        df = _leer_excel(data, hoja)
 
         # (2) Elegir columnas TIENDA y LINK/URL
         cols = list(df.columns)
@@ -184,49 +354,20 @@ if modo.startswith("🧹"):
         if any(c in cols for c in prefer):
             col_link_default = next(c for c in prefer if c in cols)
         else:
-            col_link_default = next(
-                (c for c in cols if df[c].astype(str).str.contains("http", case=False, na=False).any()),
-                cols[0]
-            )
+            col_link_default = next(iter(detectar_cols_url(df)), cols[0])
         link_idx = cols.index(col_link_default)
         col_link = st.selectbox("Columna LINK/URL:", cols, index=int(link_idx), key="depurar_link")
 
-        # (3) Limpiar y deduplicar (tienda, link)
-        base = (
-            df[[col_tienda, col_link]]
-            .dropna()
-            .astype(str)
-            .assign(**{
-                col_tienda: lambda x: x[col_tienda].str.strip(),
-                col_link:   lambda x: x[col_link].str.strip(),
-            })
-        )
-        base = base[base[col_link] != ""]
-        base.columns = ["tienda", "link"]
-
-        pares_unicos = (
-            base.drop_duplicates(subset=["tienda", "link"])
-                .sort_values(["tienda", "link"])
-                .reset_index(drop=True)
-        )
-
-        # (4) Tres vistas de salida
+        # (3) y (4) Limpiar/deduplicar y armar las vistas. Se guardan en session_state
+        # y solo se recalculan si cambia el archivo, la hoja o las columnas elegidas:
+        # cambiar la vista en pantalla no repite el trabajo.
+        clave = (hashlib.blake2b(data, digest_size=8).hexdigest(), hoja, col_tienda, col_link)
+        if st.session_state.get("depurar_clave") != clave:
+            st.session_state["depurar_vistas"] = calcular_vistas(df, col_tienda, col_link)
+            st.session_state["depurar_clave"] = clave
+        pares_unicos, wide, links_por_tienda = st.session_state["depurar_vistas"]
         links_por_filas = pares_unicos.copy()
 
-        grupos = pares_unicos.groupby("tienda")["link"].apply(list).reset_index()
-        max_links = int(grupos["link"].str.len().max()) if not grupos.empty else 0
-        wide = pd.DataFrame({"tienda": grupos["tienda"]})
-        for i in range(max_links):
-            wide[f"link_{i+1}"] = grupos["link"].apply(lambda lst, i=i: lst[i] if i < len(lst) else "")
-
-        links_por_tienda = (
-            pares_unicos.groupby("tienda")["link"]
-            .agg(["nunique", lambda s: "\n".join(s.unique())])
-            .reset_index()
-            .rename(columns={"nunique": "links_unicos", "<lambda_0>": "links_unicos_list"})
-            .sort_values("tienda")
-        )
-
         # (5) Métricas y selector de vista
         col1, col2, col3 = st.columns(3)
         col1.metric("Pares únicos", len(pares_unicos))
@@ -248,17 +389,16 @@ if modo.startswith("🧹"):
         else:
             st.dataframe(links_por_tienda, use_container_width=True, height=420)
 
-        # (6) Descargar Excel con todas las vistas
-        buf = io.BytesIO()
-        with pd.ExcelWriter(buf, engine="openpyxl") as xw:
-            links_por_filas.to_excel(xw, index=False, sheet_name="links_por_filas")
-            wide.to_excel(xw, index=False, sheet_name="links_en_columnas")
-            links_por_tienda.to_excel(xw, index=False, sheet_name="links_por_tienda")
-        st.download_button(
-            "Descargar Excel (todas las vistas)",
-            data=buf.getvalue(),
-            file_name="links_por_tienda_formateado.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        # (6) Descargar todas las vistas (Excel, CSV o Parquet)
+        boton_descarga(
+            {
+                "links_por_filas": links_por_filas,
+                "links_en_columnas": wide,
+                "links_por_tienda": links_por_tienda,
+            },
+            "links_por_tienda_formateado",
+            "Descargar (todas las vistas)",
+            key="depurar_formato",
         )
 
 # ------------------------------------------------------------
@@ -275,10 +415,17 @@ elif modo.startswith("🧩"):
         upB = st.file_uploader("Archivo B (CSV/XLSX)", type=["csv", "xlsx"], key="cmp_B")
 
     if upA and upB:
-        # Leer tablas y limpiar
-        dfA, hojaA = leer_tabla(upA)
-        dfB, hojaB = leer_tabla(upB)
-
+        # Elegir hojas y leer ambos archivos (lecturas cacheadas por contenido)
+        hojaA = elegir_hoja(upA)
+        hojaB = elegir_hoja(upB)
+        try:
+            dfA = leer_tabla(upA.name, upA.getvalue(), hojaA)
+            dfB = leer_tabla(upB.name, upB.getvalue(), hojaB)
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+
+        # Limpiar
         dfA = limpiar_df(dfA)
         dfB = limpiar_df(dfB)
 
@@ -296,17 +443,18 @@ elif modo.startswith("🧩"):
         A = limpiar_df(A)
         B = limpiar_df(B)
 
-        tiendas_A = set(A["tienda"])
-        tiendas_B = set(B["tienda"])
+        # Un solo hash join (outer + indicator) sobre las tiendas únicas de cada archivo:
+        # _merge dice si la tienda está en ambos, solo en A o solo en B
+        m = A[["tienda"]].drop_duplicates().merge(
+            B[["tienda"]].drop_duplicates(), on="tienda", how="outer", indicator=True
+        )
 
-        # Conjuntos resultado
-        coinc = sorted(tiendas_A & tiendas_B)
-        solo_A = sorted(tiendas_A - tiendas_B)  # Están en A, faltan en B
-        solo_B = sorted(tiendas_B - tiendas_A)  # Están en B, faltan en A
+        def tiendas_con(origen):
+            return m.loc[m["_merge"] == origen, ["tienda"]].sort_values("tienda").reset_index(drop=True)
 
-        df_coinc = pd.DataFrame(coinc, columns=["tienda"])
-        df_solo_A = pd.DataFrame(solo_A, columns=["tienda"])
-        df_solo_B = pd.DataFrame(solo_B, columns=["tienda"])
+        df_coinc = tiendas_con("both")
+        df_solo_A = tiendas_con("left_only")   # Están en A, faltan en B
+        df_solo_B = tiendas_con("right_only")  # Están en B, faltan en A
 
         # KPIs rápidos
         k1, k2, k3 = st.columns(3)
@@ -333,18 +481,18 @@ elif modo.startswith("🧩"):
             st.caption("Si tus archivos traen columnas link_* se usarán automático. Si no, elige una columna que contenga URLs (http/https).")
 
             # Detectar o elegir columnas de links en A
-            link_cols_A = [c for c in dfA.columns if str(c).lower().startswith("link")]
+            link_cols_A = detectar_cols_link(dfA)
             link_col_A = None
             if not link_cols_A:
-                candidates_A = [c for c in dfA.columns if dfA[c].astype(str).str.contains("http", case=False, na=False).any()]
+                candidates_A = detectar_cols_url(dfA)
                 if candidates_A:
                     link_col_A = st.selectbox("Columna LINK en A:", candidates_A, key="cmp_link_A")
 
             # Detectar o elegir columnas de links en B
-            link_cols_B = [c for c in dfB.columns if str(c).lower().startswith("link")]
+            link_cols_B = detectar_cols_link(dfB)
             link_col_B = None
             if not link_cols_B:
-                candidates_B = [c for c in dfB.columns if dfB[c].astype(str).str.contains("http", case=False, na=False).any()]
+                candidates_B = detectar_cols_url(dfB)
                 if candidates_B:
                     link_col_B = st.selectbox("Columna LINK en B:", candidates_B, key="cmp_link_B")
 
@@ -389,11 +537,5 @@ elif modo.startswith("🧩"):
                 st.write("**Links B**", b_links)
                 st.write("**Links en coincidencias (lado a lado)**", ambos)
 
-        # Descargar Excel final (comparación + links si aplica)
-        binario = descargar_excel(dfs_out, "comparacion_tiendas.xlsx")
-        st.download_button(
-            "⬇️ Descargar Excel",
-            data=binario,
-            file_name="comparacion_tiendas.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+        # Descargar resultado final (comparación + links si aplica)
+        boton_descarga(dfs_out, "comparacion_tiendas", "⬇️ Descargar", key="cmp_formato")
@@ -11,15 +11,19 @@ PREFER_COLS = ["id_visita (URL extraída)", "link", "id_visita"]
 ONE_PER_STORE = True   # True = además genera una hoja con 1 link por tienda
 # ===================================
 
+URL_RE = re.compile(r'https?://', re.IGNORECASE)
+
 def autodetect_link_column(df: pd.DataFrame, prefer: list[str]) -> str:
     """Intenta detectar la mejor columna de link."""
     for c in prefer:
         if c in df.columns:
             return c
-    url_re = re.compile(r'https?://', re.IGNORECASE)
     for c in df.columns:
-        s = df[c].astype(str)
-        if s.str.contains(url_re).any():
+        s = df[c]
+        # Solo columnas de texto pueden traer URLs
+        if not pd.api.types.is_string_dtype(s.dtype):
+            continue
+        if s.astype("string").str.contains(URL_RE, na=False).any():
             return c
     raise ValueError("No encontré ninguna columna con links/URLs.")
 
@@ -50,13 +54,12 @@ def main():
     )
 
     # Agrupar
-    links_por_tienda = (
-        pares_unicos.groupby("tienda")["link"]
-        .agg(["nunique", lambda s: "\n".join(s.unique())])
-        .reset_index()
-        .rename(columns={"nunique": "links_unicos", "<lambda_0>": "links_unicos_list"})
-        .sort_values("tienda")
-    )
+    # pares_unicos ya no tiene duplicados: size() == nunique() y no hace falta unique()
+    g = pares_unicos.groupby("tienda", sort=True)["link"]
+    links_por_tienda = pd.DataFrame({
+        "links_unicos": g.size(),
+        "links_unicos_list": g.agg("\n".join),
+    }).reset_index()
 
     # Resumen
     resumen = pd.DataFrame({
@@ -81,7 +84,7 @@ def main():
 
     # Guardar
     salida = ENTRADA.with_name(ENTRADA.stem + "_dedup.xlsx")
-    with pd.ExcelWriter(salida, engine="openpyxl") as xw:
+    with pd.ExcelWriter(salida, engine="xlsxwriter", engine_kwargs={"options": {"strings_to_urls": False}}) as xw:
         pares_unicos.to_excel(xw, index=False, sheet_name="pares_unicos")
         links_por_tienda.to_excel(xw, index=False, sheet_name="links_por_tienda")
         resumen.to_excel(xw, index=False, sheet_name="resumen")
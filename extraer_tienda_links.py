@@ -1,9 +1,15 @@
 from pathlib import Path
 import re
-from collections import defaultdict
+import zipfile
+import posixpath
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.cell import column_index_from_string, rows_from_range
+
+# lxml es más rápido si está instalado; la librería estándar basta
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 
 # ====== CONFIGURA AQUÍ ======
 RUTA = Path(r"D:\PythonExcel\20250825_entregado_detergentes.xlsx")  # <-- tu archivo
@@ -18,68 +24,187 @@ URL_PREFIX = "https://services.traxretail.com/trax-one/sindicatedmx/explore/visi
 
 GUID_RE = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
 
-def extraer_url_de_formula(s: str) -> str | None:
-    # Soporta =HIPERVINCULO("url","texto") o =HYPERLINK("url","text")
-    # Captura la PRIMERA URL entre comillas
-    m = re.search(r'"(https?://[^"]+)"', s, flags=re.IGNORECASE)
-    if m:
-        return m.group(1)
-    return None
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Soporta =HIPERVINCULO("url","texto") o =HYPERLINK("url","text")
+# Captura la PRIMERA URL entre comillas
+FORMULA_URL_RE = re.compile(r'"(https?://[^"]+)"', re.IGNORECASE)
+
+def detectar_urls(valores: pd.Series, hyperlinks: pd.Series) -> pd.Series:
+    # Misma prioridad que antes, pero con operaciones vectorizadas de pandas:
+    # a) hipervínculo "real"; b) fórmula HIPERVINCULO/HYPERLINK; c) GUID suelto
+    texto = valores.astype("string")
+    url = hyperlinks.astype("string")
+    url = url.mask(url == "")
+
+    es_formula = texto.str.startswith(("=HIPERVINCULO(", "=HYPERLINK("), na=False)
+    url = url.fillna(texto.str.extract(FORMULA_URL_RE, expand=False).where(es_formula))
+
+    guid = texto.str.strip()
+    es_guid = guid.str.fullmatch(GUID_RE, na=False)
+    url = url.fillna((URL_PREFIX + guid).where(es_guid))
+    return url
+
+def leer_relaciones(zf: zipfile.ZipFile, ruta_parte: str) -> dict[str, str]:
+    # {"rId1": destino} del archivo _rels/<parte>.rels (vacío si no existe)
+    carpeta, archivo = posixpath.split(ruta_parte)
+    ruta_rels = posixpath.join(carpeta, "_rels", archivo + ".rels")
+    if ruta_rels not in zf.namelist():
+        return {}
+    with zf.open(ruta_rels) as f:
+        return {
+            rel.get("Id"): rel.get("Target")
+            for rel in ET.parse(f).getroot().iter(f"{NS_PKG_REL}Relationship")
+        }
+
+def ruta_de_hoja(zf: zipfile.ZipFile, nombre_hoja: str | None) -> str:
+    # Ruta dentro del ZIP (p. ej. "xl/worksheets/sheet1.xml") de la hoja pedida
+    with zf.open("xl/workbook.xml") as f:
+        hojas = list(ET.parse(f).getroot().iter(f"{NS_MAIN}sheet"))
+    if nombre_hoja is None:
+        hoja = hojas[0]
+    else:
+        hoja = next((h for h in hojas if h.get("name") == nombre_hoja), None)
+        if hoja is None:
+            raise ValueError(f"No existe la hoja '{nombre_hoja}'. Hojas: {[h.get('name') for h in hojas]}")
+    destino = leer_relaciones(zf, "xl/workbook.xml")[hoja.get(f"{NS_REL}id")]
+    if destino.startswith("/"):
+        return destino.lstrip("/")
+    return posixpath.normpath(posixpath.join("xl", destino))
+
+def leer_textos_compartidos(zf: zipfile.ZipFile) -> list[str]:
+    # Tabla sharedStrings: las celdas t="s" guardan solo el índice
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    textos = []
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _, si in ET.iterparse(f, events=("end",)):
+            if si.tag != f"{NS_MAIN}si":
+                continue
+            # Texto simple (<t>) o enriquecido (<r><t>); se ignora la fonética (<rPh>)
+            partes = [si.find(f"{NS_MAIN}t")] + [r.find(f"{NS_MAIN}t") for r in si.iter(f"{NS_MAIN}r")]
+            textos.append("".join(t.text or "" for t in partes if t is not None))
+            si.clear()
+    return textos
+
+def valor_de_celda(c, textos: list[str], formulas: dict[str, str]):
+    # Igual que openpyxl con data_only=False: si hay fórmula, se devuelve "=" + fórmula
+    f = c.find(f"{NS_MAIN}f")
+    if f is not None:
+        if f.text:
+            if f.get("t") == "shared":
+                formulas[f.get("si")] = f.text
+            return "=" + f.text
+        if f.get("t") == "shared" and f.get("si") in formulas:
+            # Fórmula compartida: las URL entre comillas son las mismas que en la celda maestra
+            return "=" + formulas[f.get("si")]
+    tipo = c.get("t", "n")
+    if tipo == "inlineStr":
+        return "".join(t.text or "" for t in c.iter(f"{NS_MAIN}t"))
+    v = c.find(f"{NS_MAIN}v")
+    if v is None or v.text is None:
+        return None
+    if tipo == "s":
+        return textos[int(v.text)]
+    if tipo == "b":
+        return v.text == "1"
+    if tipo == "n":
+        try:
+            return int(v.text)
+        except ValueError:
+            return float(v.text)
+    return v.text
+
+def leer_columnas(ruta: Path, nombre_hoja: str | None, col_tienda: str, col_link: str, fila_inicio: int):
+    """
+    Lee en streaming solo las columnas TIENDA y LINK directo del XML de la hoja
+    (sin el modelo de objetos de openpyxl). Devuelve tres listas paralelas, una
+    entrada por fila desde `fila_inicio`: tienda, valor de la celda de link y
+    destino del hipervínculo "real" de esa celda (o None).
+    """
+    idx_tienda = column_index_from_string(col_tienda)
+    idx_link = column_index_from_string(col_link)
+    tiendas, valores = [], []
+    hipervinculos = {}
+    with zipfile.ZipFile(ruta) as zf:
+        ruta_hoja = ruta_de_hoja(zf, nombre_hoja)
+        textos = leer_textos_compartidos(zf)
+        destinos = leer_relaciones(zf, ruta_hoja)
+        formulas = {}
+        sheet_data = None
+        n_fila = 0
+        with zf.open(ruta_hoja) as f:
+            for evento, elem in ET.iterparse(f, events=("start", "end")):
+                if evento == "start":
+                    if elem.tag == f"{NS_MAIN}sheetData":
+                        sheet_data = elem
+                    continue
+                if elem.tag == f"{NS_MAIN}row":
+                    n_fila = int(elem.get("r", n_fila + 1))
+                    if n_fila >= fila_inicio:
+                        # Igual que iter_rows de openpyxl: las filas vacías intermedias cuentan
+                        faltan = n_fila - fila_inicio - len(tiendas)
+                        tiendas.extend([None] * faltan)
+                        valores.extend([None] * faltan)
+                        tienda = valor = None
+                        n_col = 0
+                        for c in elem.iter(f"{NS_MAIN}c"):
+                            ref = c.get("r")
+                            n_col = column_index_from_string(ref.rstrip("0123456789")) if ref else n_col + 1
+                            if n_col == idx_tienda:
+                                tienda = valor_de_celda(c, textos, formulas)
+                            elif n_col == idx_link:
+                                valor = valor_de_celda(c, textos, formulas)
+                        tiendas.append(tienda)
+                        valores.append(valor)
+                    # Libera las filas ya procesadas: memoria constante
+                    sheet_data.clear()
+                elif elem.tag == f"{NS_MAIN}hyperlink":
+                    # <hyperlinks> va después de <sheetData>
+                    target = destinos.get(elem.get(f"{NS_REL}id"))
+                    if target:
+                        for fila in rows_from_range(elem.get("ref")):
+                            for coord in fila:
+                                hipervinculos[coord] = target
+
+    hyperlinks = [hipervinculos.get(f"{col_link}{n}") for n in range(fila_inicio, fila_inicio + len(tiendas))]
+    return tiendas, valores, hyperlinks
 
 def main():
-    # IMPORTANTE: data_only=False para ver la fórmula HIPERVINCULO
-    wb = load_workbook(RUTA, data_only=False, keep_links=True)
-    ws = wb[NOMBRE_HOJA] if NOMBRE_HOJA else wb.worksheets[0]
-
-    idx_tienda = column_index_from_string(COL_TIENDA)
-    idx_link = column_index_from_string(COL_LINK)
-
-    pares = []  # (tienda, url)
-    diag = []   # diagnóstico para revisar qué leyó
-
-    for row in ws.iter_rows(min_row=FILA_INICIO, values_only=False):
-        tienda = row[idx_tienda - 1].value
-        celda = row[idx_link - 1]
-
-        url = None
-        # a) Si hay hipervínculo "real" (Insertar vínculo)
-        if celda.hyperlink and celda.hyperlink.target:
-            url = celda.hyperlink.target
-
-        # b) Si hay fórmula HIPERVINCULO/HYPERLINK, léela (con data_only=False)
-        if not url and isinstance(celda.value, str) and celda.value.startswith(("=HIPERVINCULO(", "=HYPERLINK(")):
-            url = extraer_url_de_formula(celda.value)
-
-        # c) Si solo hay GUID, arma la URL
-        if not url and isinstance(celda.value, str) and GUID_RE.fullmatch(celda.value.strip()):
-            url = URL_PREFIX + celda.value.strip()
-
-        if tienda and url:
-            pares.append((str(tienda).strip(), url.strip()))
-
-        # Para revisar qué hay en esa celda
-        diag.append({
-            "tienda": tienda,
-            "valor_celda_L": celda.value,
-            "hyperlink_target": (celda.hyperlink.target if celda.hyperlink else None),
-            "url_detectada": url
-        })
-
-    df = pd.DataFrame(pares, columns=["tienda", "link"])
+    # Lectura directa del XML (data_only=False implícito: se ven las fórmulas HIPERVINCULO)
+    tiendas, valores, hyperlinks = leer_columnas(RUTA, NOMBRE_HOJA, COL_TIENDA, COL_LINK, FILA_INICIO)
+
+    tienda = pd.Series(tiendas, dtype=object)
+    valor = pd.Series(valores, dtype=object)
+    hyperlink = pd.Series(hyperlinks, dtype=object)
+    url = detectar_urls(valor, hyperlink)
+
+    ok = tienda.astype(bool) & url.notna() & (url != "")
+    df = pd.DataFrame({
+        "tienda": tienda[ok].astype(str).str.strip(),
+        "link": url[ok].str.strip(),
+    }).reset_index(drop=True)
     df_unique = df.drop_duplicates(subset=["tienda", "link"]).sort_values(["tienda", "link"])
 
-    # Agrupar links por tienda
-    agrupado = defaultdict(list)
-    for t, l in df_unique.itertuples(index=False):
-        agrupado[t].append(l)
-    df_group = pd.DataFrame([(t, "\n".join(links)) for t, links in sorted(agrupado.items())],
-                            columns=["tienda", "links_de_tienda"])
-
-    # Diagnóstico: primeras 50 filas
-    df_diag = pd.DataFrame(diag).head(50)
+    # Agrupar links por tienda (df_unique ya viene ordenado por tienda y link)
+    df_group = (
+        df_unique.groupby("tienda", sort=True)["link"]
+        .agg("\n".join)
+        .reset_index(name="links_de_tienda")
+    )
+
+    # Diagnóstico: primeras 50 filas, para revisar qué hay en la celda de link
+    df_diag = pd.DataFrame({
+        "tienda": tienda,
+        "valor_celda_L": valor,
+        "hyperlink_target": hyperlink,
+        "url_detectada": url,
+    }).head(50)
 
     salida = RUTA.with_name(RUTA.stem + "_tienda_links.xlsx")
-    with pd.ExcelWriter(salida, engine="openpyxl") as xw:
+    with pd.ExcelWriter(salida, engine="xlsxwriter", engine_kwargs={"options": {"strings_to_urls": False}}) as xw:
         df_unique.to_excel(xw, index=False, sheet_name="pares_unicos")
         df_group.to_excel(xw, index=False, sheet_name="links_por_tienda")
         df_diag.to_excel(xw, index=False, sheet_name="diagnostico")